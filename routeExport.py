@@ -0,0 +1,259 @@
+import os
+import json
+import random
+import multiprocessing
+from xml.sax.saxutils import escape
+
+import osmnx as ox
+import matplotlib
+matplotlib.use('Agg') # workers never open a window, they only write files
+import matplotlib.pyplot as plt
+import folium
+from folium.features import DivIcon
+
+import routeFinding
+
+# =================================
+# Batch export of planned routes
+# Takes many route results (lists of vertices) and writes HTML, GeoJSON, GPX and PNG
+# files for each of them using a pool of worker processes.
+# - the graph is loaded once per worker (not pickled with every route)
+# - the static base map is rendered once to a PNG and reused as the background of every route PNG
+# - each worker writes its route's files to disk as soon as it is done, nothing is kept in memory
+
+GRAPH_FILE = 'graph.gml'
+OUTPUT_DIR = 'exports'
+BASE_MAP_FILE = 'base_map.png'
+FORMATS = ('html', 'geojson', 'gpx', 'png')
+
+# per-worker state, filled in by init_worker
+_graph = None
+_base_map = None
+
+
+# Renders the street network once and saves it as a PNG that every route PNG is drawn on top of.
+# The axes fill the whole figure so the image can be placed back at exactly the same
+# map coordinates. Returns the info workers need to do that: image path, x/y limits, size and dpi.
+def render_base_map(graph, filepath, dpi=100):
+    fig, ax = ox.plot_graph(graph, node_size=0, edge_color='#999999', edge_linewidth=0.5,
+                            bgcolor='w', show=False, close=False)
+    ax.set_position([0, 0, 1, 1])
+    # plot_graph keeps an equal aspect by shrinking the axes box, which would leave blank bands
+    # at the sides of the image. Widen the x/y limits instead so the axes covers the whole figure.
+    ax.set_autoscale_on(True)
+    ax.set_adjustable('datalim')
+    ax.axis('off')
+    fig.savefig(filepath, dpi=dpi)
+    position = tuple(ax.get_position().bounds)
+    base_map = {
+        'path': filepath,
+        'xlim': ax.get_xlim(),
+        'ylim': ax.get_ylim(),
+        'size': tuple(fig.get_size_inches()),
+        'dpi': dpi,
+    }
+    plt.close(fig)
+    if position != (0, 0, 1, 1) or not check_base_map(graph, base_map):
+        raise RuntimeError("base map does not line up with the map coordinates, route PNGs would be misplaced")
+    return base_map
+
+
+# Returns the (column, row) pixel of map point (x, y) in an image covering base_map's x/y limits.
+# write_png draws routes with exactly this mapping.
+def map_to_pixel(base_map, x, y, shape):
+    (x0, x1), (y0, y1) = base_map['xlim'], base_map['ylim']
+    h, w = shape[:2]
+    col = int((x - x0) / (x1 - x0) * w)
+    row = int((y1 - y) / (y1 - y0) * h)
+    return min(max(col, 0), w - 1), min(max(row, 0), h - 1)
+
+
+# Sanity check of the saved base map: the westernmost street node (where any misalignment is
+# largest) must land on a drawn (non-background) pixel, give or take one pixel for anti-aliasing.
+# Otherwise routes would be drawn off their streets.
+def check_base_map(graph, base_map):
+    u = min((u for u, v in graph.edges()), key=lambda n: graph.nodes[n]['x'])
+    image = plt.imread(base_map['path'])
+    col, row = map_to_pixel(base_map, graph.nodes[u]['x'], graph.nodes[u]['y'], image.shape)
+    window = image[max(row-1, 0):row+2, max(col-1, 0):col+2, :3]
+    return bool((window.sum(axis=2) < 2.9).any())
+
+
+# Runs once in every worker process: load the graph from disk and read the base map image.
+def init_worker(graph_file, base_map):
+    global _graph, _base_map
+    _graph = ox.io.load_graphml(graph_file)
+    _base_map = dict(base_map)
+    if _base_map.get('path'):
+        _base_map['image'] = plt.imread(_base_map['path'])
+
+
+# Returns the list of (lon, lat) points along the route, following the street geometry
+# when an edge has one and the straight line between its end nodes otherwise.
+# Edge geometries are not guaranteed to point from u to v, so flip them when needed.
+def route_coords(graph, rt):
+    coords = [(graph.nodes[rt[0]]['x'], graph.nodes[rt[0]]['y'])]
+    for u, v in zip(rt[:-1], rt[1:]):
+        if u == v:
+            continue
+        edge = graph.edges[u, v, 0]
+        if 'geometry' in edge:
+            pts = list(edge['geometry'].coords)
+            ux, uy = graph.nodes[u]['x'], graph.nodes[u]['y']
+            if (pts[0][0] - ux) ** 2 + (pts[0][1] - uy) ** 2 > (pts[-1][0] - ux) ** 2 + (pts[-1][1] - uy) ** 2:
+                pts.reverse()
+            coords += pts[1:]
+        else:
+            coords.append((graph.nodes[v]['x'], graph.nodes[v]['y']))
+    return coords
+
+
+# Splits the route into one list of (lon, lat) points per edge, so each edge can get
+# its own rainbow color like in routePlan.py.
+def route_segments(graph, rt):
+    segments = []
+    for u, v in zip(rt[:-1], rt[1:]):
+        if u != v:
+            segments.append(route_coords(graph, [u, v]))
+    return segments
+
+
+# Writes the route as a GeoJSON FeatureCollection with a single LineString.
+def write_geojson(filepath, coords, eg):
+    feature = {
+        'type': 'Feature',
+        'geometry': {'type': 'LineString', 'coordinates': [list(c) for c in coords]},
+        'properties': {'elevation_gain': eg},
+    }
+    with open(filepath, 'w') as f:
+        json.dump({'type': 'FeatureCollection', 'features': [feature]}, f)
+
+
+# Writes the route as a GPX track following the street geometry (same points as the GeoJSON).
+# Elevation is only known at graph nodes, so <ele> is written for the points that are route vertices.
+def write_gpx(filepath, name, graph, rt, coords):
+    elevations = {}
+    for node in rt:
+        data = graph.nodes[node]
+        if 'elevation' in data:
+            elevations[(data['x'], data['y'])] = data['elevation']
+    with open(filepath, 'w') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        f.write('<gpx version="1.1" creator="DFS_WorkoutPlan" xmlns="http://www.topografix.com/GPX/1/1">\n')
+        f.write(f'<trk><name>{escape(name)}</name><trkseg>\n')
+        for lon, lat in coords:
+            f.write(f'<trkpt lat="{lat}" lon="{lon}">')
+            if (lon, lat) in elevations:
+                f.write(f'<ele>{elevations[(lon, lat)]}</ele>')
+            f.write('</trkpt>\n')
+        f.write('</trkseg></trk>\n</gpx>\n')
+
+
+# Writes the interactive folium map: one rainbow colored line per edge, the elevation
+# gain label and the start/end circles, same as routePlan.py.
+def write_html(filepath, segments, eg):
+    start, end = segments[0][0], segments[-1][-1]
+    m = folium.Map(location=(start[1], start[0]), zoom_start=15)
+    for i, seg in enumerate(segments):
+        folium.PolyLine([(lat, lon) for lon, lat in seg],
+                        color=routeFinding.shade_given_time(i, len(segments)), weight=5).add_to(m)
+    folium.map.Marker(
+        [end[1], end[0]],
+        icon=DivIcon(
+            icon_size=(250,36),
+            icon_anchor=(0,0),
+            html=f'<div style="font-size: 20pt">Elevation Gain: {eg}m</div>',
+        )
+    ).add_to(m)
+    folium.CircleMarker((start[1], start[0]), color='green', radius=10, fill=True).add_to(m)
+    folium.CircleMarker((end[1], end[0]), color='blue', radius=10, fill=True).add_to(m)
+    m.save(filepath)
+
+
+# Writes the PNG: the pre-rendered base map as background, the route drawn on top.
+def write_png(filepath, segments, base_map):
+    fig = plt.figure(figsize=base_map['size'], dpi=base_map['dpi'])
+    ax = fig.add_axes([0, 0, 1, 1])
+    ax.axis('off')
+    (x0, x1), (y0, y1) = base_map['xlim'], base_map['ylim']
+    ax.imshow(base_map['image'], extent=(x0, x1, y0, y1), aspect='auto')
+    for i, seg in enumerate(segments):
+        xs, ys = zip(*seg)
+        ax.plot(xs, ys, color=routeFinding.shade_given_time(i, len(segments)), linewidth=3)
+    ax.set_xlim(x0, x1)
+    ax.set_ylim(y0, y1)
+    fig.savefig(filepath, dpi=base_map['dpi'])
+    plt.close(fig)
+
+
+# Exports a single route in every requested format. Runs inside a worker process.
+# job = (name, list of route vertices, output directory, formats)
+# Returns the name and the list of files written.
+def export_route(job):
+    name, rt, out_dir, formats = job
+    graph = _graph
+    eg = routeFinding.total_elevation_gain(graph, rt)
+    segments = route_segments(graph, rt)
+    written = []
+    if not segments:
+        return name, written
+    base = os.path.join(out_dir, name)
+    coords = route_coords(graph, rt)
+    if 'geojson' in formats:
+        write_geojson(base + '.geojson', coords, eg)
+        written.append(base + '.geojson')
+    if 'gpx' in formats:
+        write_gpx(base + '.gpx', name, graph, rt, coords)
+        written.append(base + '.gpx')
+    if 'html' in formats:
+        write_html(base + '.html', segments, eg)
+        written.append(base + '.html')
+    if 'png' in formats and _base_map.get('image') is not None:
+        write_png(base + '.png', segments, _base_map)
+        written.append(base + '.png')
+    return name, written
+
+
+# Main export function.
+# routes = iterable of (name, route vertices) pairs, e.g. from routeFinding.get_route_vertices
+# The base map is rendered once here, then routes are handed out to the pool in chunks
+# and results are reported as soon as each route is on disk.
+def export_routes(routes, graph_file=GRAPH_FILE, out_dir=OUTPUT_DIR, formats=FORMATS,
+                  processes=None, chunksize=8):
+    os.makedirs(out_dir, exist_ok=True)
+    base_map = {}
+    if 'png' in formats:
+        graph = ox.io.load_graphml(graph_file)
+        base_map = render_base_map(graph, os.path.join(out_dir, BASE_MAP_FILE))
+        del graph
+
+    jobs = ((name, list(rt), out_dir, tuple(formats)) for name, rt in routes)
+    count = 0
+    with multiprocessing.Pool(processes, initializer=init_worker,
+                              initargs=(graph_file, base_map)) as pool:
+        for name, written in pool.imap_unordered(export_route, jobs, chunksize=chunksize):
+            count += 1
+            if written:
+                print("exported route %s (%d done)" % (name, count))
+            else:
+                print("skipped empty route %s (%d done)" % (name, count))
+    return count
+
+
+# =======================================================
+# Main driving code: plan a batch of routes from random start nodes and export them all.
+if __name__ == '__main__':
+    num_routes = 20
+    goal_dist = 2000  # meters, must go at least this far
+
+    graph = ox.io.load_graphml(GRAPH_FILE)
+    starts = random.sample(list(graph.nodes), num_routes)
+
+    routes = []
+    for start in starts:
+        route, time = routeFinding.find_route(start, goal_dist, graph)
+        if route is not None:
+            routes.append((f"route_{start}", routeFinding.get_route_vertices(route)))
+
+    count = export_routes(routes)
+    print(f"Exported {count} routes to {OUTPUT_DIR}/")
@@ -59,9 +59,10 @@ def find_route(start, goal_dist, graph):
     stack = deque()
     stack.append((gstate, start, start, 0, 0))
     
-    # next two lines are necessary for part 2) so that every current bearing has a previous bearing to compare against
-    graph.add_edge(start, start, 0)
-    graph.edges[start, start, 0]['bearing'] = random.randint(0,360) # grab a random initial direction
+    # necessary for part 2) so that every current bearing has a previous bearing to compare against.
+    # kept here instead of adding a (start, start) edge to 'graph', so the graph is never modified
+    # and can be shared between threads/processes (see sharedGraph.py)
+    start_bearing = random.randint(0,360) # grab a random initial direction
     
     # define a fixed margin threshold (e.g., 100 meters)
     margin = 100  # allow a fixed 100m margin beyond goal distance
@@ -79,9 +80,13 @@ def find_route(start, goal_dist, graph):
 
             if STRAIGHTER_PATH:
                 # neighbors for part 2 - the "straightest" path
+                if prev == start and curr == start:
+                    curr_bearing = start_bearing
+                else:
+                    curr_bearing = graph.edges[prev, curr, 0]['bearing']
                 neighbors = reversed(sorted(graph.neighbors(curr),
                                     key=lambda x: get_bearing_diff(
-                                        graph.edges[prev, curr, 0]['bearing'],
+                                        curr_bearing,
                                         graph.edges[curr, x, 0]['bearing'])
                                     )) # reversing order so that the straightest path is explored first, is at the end of the stack
             else:
@@ -97,6 +102,14 @@ def find_route(start, goal_dist, graph):
     print("No route found that meets the goal distance.")
     return None, None  # Return None if no route is found
 
+# Turns the solution DiGraph returned by find_route into the list of vertices along the path.
+# route.edges() returns tuples (from_node, to_node); sorting them by the 'time' attribute
+# reconstructs the chronological order of the path, then we keep the first node and every "to" node.
+def get_route_vertices(route):
+    sorted_route = sorted(route.edges(), key=lambda x: route.edges[x[0], x[1]]['time'])
+    return [u if i == 0 else v for i, (u, v) in enumerate(sorted_route)]
+
+
 # returns the total elevation gain in gr, over the route described by rt (list of vertices).
 # edges whose elevation gain is negative should be ignored.
 # you can refer to a node's elevation by: gr.nodes[rt[k]]['elevation'], where k is the kth element
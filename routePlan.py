@@ -52,13 +52,8 @@ if route is None or time is None:
 print(f"Route: {route}, Time: {time}")
 
 # variable 'route' is a DiGraph, but we want a sequence of vertices along the solution path.
-# take a look at these variables to see what's going on.
-# route.edges() returns a tuple (from_node, to_node)
-# sorted_route sorts it based on time, reconstructs the chronological order of the path
-sorted_route = sorted(route.edges(), key=lambda x: route.edges[x[0], x[1]]['time']) 
-
-# assemble the list of vertices in order.
-route_vertices = [u if i == 0 else v for i, (u,v) in enumerate(sorted_route)]
+# assemble the list of vertices in order (see routeFinding.get_route_vertices).
+route_vertices = routeFinding.get_route_vertices(route)
 # print(route_vertices)
 
 # find coordinates of stopping point: last node on the route
@@ -0,0 +1,276 @@
+import os
+import random
+import multiprocessing
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import routeFinding
+
+# =================================
+# Read-only graph stored in flat numpy arrays
+# A NetworkX graph loaded with ox.io.load_graphml is a big tree of python dicts, and every
+# process that plans routes needs its own copy. Here the parts find_route needs are packed into
+# a few arrays that can live in shared memory (multiprocessing.shared_memory) or in .npy files
+# opened with mmap, so N workers can attach to a single copy without pickling the graph.
+#
+# Layout (n nodes, m edges):
+# - node_ids: sorted OSM node ids, a node's position in this array is its index
+# - x, y, elevation: node coordinates and elevation, by node index (NaN where the node has no such attribute)
+# - indptr, indices: adjacency in CSR form, the neighbors of node i are
+#   indices[indptr[i]:indptr[i+1]], in the same order as graph.neighbors
+# - length, bearing: attributes of edge (u, v, 0), aligned with indices
+#
+# SharedGraph supports the part of the NetworkX API used by routeFinding.py, so find_route
+# and total_elevation_gain work on it unchanged.
+
+NODE_FIELDS = ('x', 'y', 'elevation')
+EDGE_FIELDS = ('length', 'bearing')
+FIELDS = ('node_ids',) + NODE_FIELDS + ('indptr', 'indices') + EDGE_FIELDS
+
+
+# Packs a NetworkX (Multi)DiGraph into the arrays described above.
+# Only the first edge between two nodes is kept, since the route finding code always uses key 0.
+def graph_to_arrays(graph):
+    node_ids = np.array(sorted(graph.nodes), dtype=np.int64)
+    arrays = {'node_ids': node_ids}
+    for field in NODE_FIELDS:
+        arrays[field] = np.array([graph.nodes[n].get(field, np.nan) for n in node_ids.tolist()],
+                                 dtype=np.float64)
+
+    indptr = [0]
+    indices = []
+    edge_values = {field: [] for field in EDGE_FIELDS}
+    for u in node_ids.tolist():
+        for v in graph.neighbors(u):
+            edge_data = graph.get_edge_data(u, v)
+            data = edge_data[list(edge_data.keys())[0]]
+            indices.append(v)
+            for field in EDGE_FIELDS:
+                edge_values[field].append(data.get(field, np.nan))
+        indptr.append(len(indices))
+
+    arrays['indptr'] = np.array(indptr, dtype=np.int64)
+    arrays['indices'] = np.searchsorted(node_ids, np.array(indices, dtype=np.int64))
+    for field in EDGE_FIELDS:
+        arrays[field] = np.array(edge_values[field], dtype=np.float64)
+    return arrays
+
+
+# Node attribute view so that graph.nodes[n]['elevation'] etc. work like in NetworkX.
+class _NodeView:
+    def __init__(self, sg):
+        self._sg = sg
+
+    # missing attributes (stored as NaN) are left out, so looking them up raises KeyError like in NetworkX
+    def __getitem__(self, n):
+        i = self._sg._index(n)
+        data = {}
+        for field in NODE_FIELDS:
+            value = float(self._sg.arrays[field][i])
+            if not np.isnan(value):
+                data[field] = value
+        return data
+
+    def __contains__(self, n):
+        return n in self._sg
+
+    def __iter__(self):
+        return iter(self._sg)
+
+    def __len__(self):
+        return len(self._sg)
+
+
+# Edge attribute view so that graph.edges[u, v, 0]['length'] etc. work like in NetworkX.
+class _EdgeView:
+    def __init__(self, sg):
+        self._sg = sg
+
+    def __getitem__(self, e):
+        u, v, key = e
+        pos = self._sg._edge_pos(u, v)
+        if pos is None or key != 0:
+            raise KeyError(e)
+        return self._sg._edge_data(pos)
+
+
+class SharedGraph:
+    def __init__(self, arrays, handles=(), dirpath=None):
+        self.arrays = arrays
+        self._handles = list(handles) # SharedMemory blocks to keep alive while the arrays are in use
+        self._dirpath = dirpath # directory of .npy files when opened with load()
+        self.nodes = _NodeView(self)
+        self.edges = _EdgeView(self)
+
+    # ---------------------------------
+    # creating / attaching
+
+    # Copies the arrays of 'graph' into new shared memory blocks. By default each block gets a unique
+    # name picked by SharedMemory; if 'name' is given the blocks are named '<name>_<field>'.
+    # The creating process owns the blocks and must call unlink() once all workers are done.
+    @classmethod
+    def create(cls, graph, name=None):
+        arrays = graph_to_arrays(graph)
+        shared, handles = {}, []
+        try:
+            for field in FIELDS:
+                arr = arrays[field]
+                shm_name = f"{name}_{field}" if name else None
+                shm = shared_memory.SharedMemory(name=shm_name, create=True, size=max(arr.nbytes, 1))
+                handles.append(shm)
+                shared[field] = np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)
+                shared[field][:] = arr
+        except BaseException:
+            # don't leave the blocks made so far allocated
+            shared.clear()
+            for shm in handles:
+                shm.close()
+                shm.unlink()
+            raise
+        return cls(shared, handles)
+
+    # Small picklable description of where the arrays live, this is all a worker needs to attach:
+    # the shared memory blocks for a graph from create()/attach(), or the directory for one from load().
+    def spec(self):
+        if self._handles:
+            return {'shm': {field: (shm.name, self.arrays[field].shape, self.arrays[field].dtype.str)
+                            for field, shm in zip(FIELDS, self._handles)}}
+        if self._dirpath:
+            return {'dir': self._dirpath}
+        raise ValueError("graph is neither in shared memory nor memory-mapped, use create() or save()/load() first")
+
+    # Attaches to the arrays described by spec() in another process. No data is copied.
+    @classmethod
+    def attach(cls, spec):
+        if 'dir' in spec:
+            return cls.load(spec['dir'])
+        arrays, handles = {}, []
+        for field in FIELDS:
+            shm_name, shape, dtype = spec['shm'][field]
+            shm = shared_memory.SharedMemory(name=shm_name)
+            arr = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+            arr.flags.writeable = False
+            arrays[field] = arr
+            handles.append(shm)
+        return cls(arrays, handles)
+
+    # Saves the arrays as .npy files in 'dirpath' so they can be memory-mapped with load().
+    def save(self, dirpath):
+        os.makedirs(dirpath, exist_ok=True)
+        for field in FIELDS:
+            np.save(os.path.join(dirpath, field + '.npy'), self.arrays[field])
+
+    # Opens arrays written by save() as read-only memory maps; the OS shares the pages between processes.
+    @classmethod
+    def load(cls, dirpath):
+        return cls({field: np.load(os.path.join(dirpath, field + '.npy'), mmap_mode='r')
+                    for field in FIELDS}, dirpath=dirpath)
+
+    def close(self):
+        self.arrays = {}
+        for shm in self._handles:
+            shm.close()
+
+    def unlink(self):
+        handles = self._handles
+        self.close()
+        for shm in handles:
+            shm.unlink()
+
+    # ---------------------------------
+    # lookups
+
+    # index of node id n in node_ids, found by binary search so attaching needs no id -> index dict
+    def _index(self, n):
+        node_ids = self.arrays['node_ids']
+        i = int(np.searchsorted(node_ids, n))
+        if i == len(node_ids) or node_ids[i] != n:
+            raise KeyError(n)
+        return i
+
+    # position of edge (u, v) in indices/length/bearing, or None if there is no such edge
+    def _edge_pos(self, u, v):
+        if u not in self or v not in self:
+            return None
+        i, j = self._index(u), self._index(v)
+        lo, hi = self.arrays['indptr'][i], self.arrays['indptr'][i+1]
+        hits = np.flatnonzero(self.arrays['indices'][lo:hi] == j)
+        return int(lo + hits[0]) if len(hits) else None
+
+    def _edge_data(self, pos):
+        return {field: float(self.arrays[field][pos]) for field in EDGE_FIELDS}
+
+    # ---------------------------------
+    # NetworkX-style API used by routeFinding.py
+
+    def __iter__(self):
+        return iter(self.arrays['node_ids'].tolist())
+
+    def __len__(self):
+        return len(self.arrays['node_ids'])
+
+    def __contains__(self, n):
+        try:
+            self._index(n)
+        except (KeyError, TypeError):
+            return False
+        return True
+
+    def neighbors(self, n):
+        i = self._index(n)
+        lo, hi = self.arrays['indptr'][i], self.arrays['indptr'][i+1]
+        return iter(self.arrays['node_ids'][self.arrays['indices'][lo:hi]].tolist())
+
+    def has_edge(self, u, v):
+        return self._edge_pos(u, v) is not None
+
+    def get_edge_data(self, u, v, default=None):
+        pos = self._edge_pos(u, v)
+        if pos is None:
+            return default
+        return {0: self._edge_data(pos)}
+
+
+# =======================================================
+# Worker side: each process attaches to the shared graph once, then plans routes on it.
+_graph = None
+
+
+def init_worker(spec):
+    global _graph
+    _graph = SharedGraph.attach(spec)
+
+
+# job = (start node, goal distance). Returns the start node and the list of route vertices (or None).
+def plan_route(job):
+    start, goal_dist = job
+    route, time = routeFinding.find_route(start, goal_dist, _graph)
+    if route is None:
+        return start, None
+    return start, routeFinding.get_route_vertices(route)
+
+
+# =======================================================
+# Main driving code: put the graph in shared memory once and plan routes from many start nodes in parallel.
+if __name__ == '__main__':
+    import osmnx as ox
+
+    num_routes = 20
+    goal_dist = 2000  # meters, must go at least this far
+
+    graph = ox.io.load_graphml('graph.gml')
+    sg = SharedGraph.create(graph)
+    del graph
+
+    starts = random.sample(list(sg), num_routes)
+    try:
+        with multiprocessing.Pool(initializer=init_worker, initargs=(sg.spec(),)) as pool:
+            for start, rt in pool.imap_unordered(plan_route, [(s, goal_dist) for s in starts]):
+                if rt is None:
+                    print(f"No route from {start}")
+                else:
+                    eg = routeFinding.total_elevation_gain(sg, rt)
+                    print(f"Route from {start}: {len(rt)} vertices, elevation gain {eg}m")
+    finally:
+        sg.unlink()